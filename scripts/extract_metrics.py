@@ -1,9 +1,13 @@
 
 import json
+import mmap
 import os
 import re
+import sys
 from datetime import datetime
 
+import orjson
+
 LOG_FILES = {
     "pre": "pre_verification.log",
     "post": "post_verification.log",
@@ -12,82 +16,177 @@ LOG_FILES = {
 
 OUTPUT_FILE = "result.json"
 
-def parse_pytest_output(content):
+# result.json token field -> key in a response event's usage dict
+USAGE_KEYS = {
+    "input": "input_tokens",
+    "output": "output_tokens",
+    "cache_read": "cache_read_input_tokens",
+    "cache_write": "cache_creation_input_tokens",
+}
+
+# Compiled once at import; parse_pytest_output runs them on every log.
+_FAILED_RE = re.compile(r"(\d+)\s+failed")
+_PASSED_RE = re.compile(r"(\d+)\s+passed")
+_NO_TESTS = "no tests ran"
+_COLLECTED0 = "collected 0 items"
+
+# The pytest summary line is always at the end of the log, so only the
+# tail of each verification log is searched for counts.  The collection
+# header ("collected 0 items") is at the top, so the head is read too.
+HEAD_BYTES = 4096
+TAIL_BYTES = 8192
+SUMMARY_TAIL = 4096
+
+def read_head(path, size=HEAD_BYTES):
+    """
+    Return the first `size` bytes of a file decoded as text.
+    """
+    with open(path, 'rb') as f:
+        return f.read(size).decode('utf-8', 'replace')
+
+def read_tail(path, size=TAIL_BYTES):
+    """
+    Return the last `size` bytes of a file decoded as text.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        # Map the file so only the pages holding the tail are read in.
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[-size:].decode('utf-8', 'replace')
+
+# log_event writes the timestamp first, so lines whose type cannot be one
+# the metrics care about only need this prefix, not a full JSON parse.
+# Such lines are deliberately not validated as JSON; main only requires
+# them to end in "}" so a line cut short by an interrupted write is
+# parsed (and dropped) instead.
+_TS_PREFIX_RE = re.compile(rb'\{"timestamp": ?"([0-9T:.+\-Z]+)"')
+
+# UTC timestamps as log_event writes them, with or without microseconds.
+# Anything else would sort unpredictably against them, so it is skipped.
+_TS_RE = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d{6})?Z")
+
+# log_event always writes UTC with a trailing "Z", which fromisoformat
+# understands natively from Python 3.11 on.
+_FROMISO_HANDLES_Z = sys.version_info >= (3, 11)
+
+def _parse_ts(s):
+    if not _FROMISO_HANDLES_Z and s.endswith('Z'):
+        return datetime.fromisoformat(s[:-1])
+    return datetime.fromisoformat(s)
+
+def parse_pytest_output(content, head=None):
     """
     Parse pytest output to find number of passed/failed tests.
+
+    `content` may be just the tail of the log; pass the start of the log
+    as `head` so header markers are still seen.
     """
     if not content:
         return {"passed": 0, "failed": 0, "error": False}
 
-    if "no tests ran" in content or "ERROR" in content:
-        if "collected 0 items" in content:
-             return {"passed": 0, "failed": 0, "error": True}
+    markers = content if head is None else head + content
+    if (_NO_TESTS in markers or "ERROR" in markers) and _COLLECTED0 in markers:
+        return {"passed": 0, "failed": 0, "error": True}
 
     # Look for the final summary line: "== 1 failed, 4 passed in 0.12s =="
     # Try a more robust search
     passed = 0
     failed = 0
+    tail = content[-SUMMARY_TAIL:]
+    if "passed" not in tail and "failed" not in tail:
+        return {"passed": passed, "failed": failed, "error": False}
     
-    failed_match = re.search(r"(\d+)\s+failed", content)
+    failed_match = _FAILED_RE.search(tail)
     if failed_match:
         failed = int(failed_match.group(1))
         
-    passed_match = re.search(r"(\d+)\s+passed", content)
+    passed_match = _PASSED_RE.search(tail)
     if passed_match:
         passed = int(passed_match.group(1))
         
     return {"passed": passed, "failed": failed, "error": False}
 
 def main():
-    start_time = None
-    end_time = None
-    tokens = {"input": 0, "output": 0, "cache_read": 0, "cache_write": 0}
+    # Fixed-width UTC ISO strings sort lexicographically, so the extremes
+    # are tracked as raw strings and only those two are parsed.
+    min_ts = None
+    max_ts = None
+    usages = []
     tool_usage = {"read": 0, "write": 0, "edit": 0, "bash": 0}
     
+    # One directory listing instead of a stat() per artifact
+    with os.scandir(os.curdir) as it:
+        present = {entry.name for entry in it}
+
     # 1. Analyze Agent Logs
-    if os.path.exists(LOG_FILES['agent']):
-        with open(LOG_FILES['agent'], 'r') as f:
-            for line in f:
-                try:
-                    event = json.loads(line)
-                    t = datetime.fromisoformat(event['timestamp'].replace('Z', ''))
-                    if start_time is None or t < start_time:
-                        start_time = t
-                    if end_time is None or t > end_time:
-                        end_time = t
-                    
-                    if event['type'] == 'response':
-                        usage = event.get('usage', {})
-                        tokens['input'] += usage.get('input_tokens', 0)
-                        tokens['output'] += usage.get('output_tokens', 0)
-                        tokens['cache_read'] += usage.get('cache_read_input_tokens', 0)
-                        tokens['cache_write'] += usage.get('cache_creation_input_tokens', 0)
-                    
-                    if event['type'] == 'tool_use':
-                        tool_usage['edit'] += 1  # Patch application is like an edit
-                except:
+    if LOG_FILES['agent'] in present:
+        with open(LOG_FILES['agent'], 'rb') as f:
+            data = f.read()
+        for line in data.split(b'\n'):
+            if not line:
+                continue
+            prefix = None
+            if (line.endswith(b'}')
+                    and b'"response"' not in line and b'"tool_use"' not in line):
+                prefix = _TS_PREFIX_RE.match(line)
+            try:
+                if prefix:
+                    event = None
+                    ts = prefix.group(1).decode('ascii')
+                else:
+                    event = orjson.loads(line)
+                    ts = event['timestamp']
+                if not isinstance(ts, str) or not _TS_RE.fullmatch(ts):
+                    continue
+                if min_ts is None or ts < min_ts:
+                    min_ts = ts
+                if max_ts is None or ts > max_ts:
+                    max_ts = ts
+                if event is None:
                     continue
+                
+                if event['type'] == 'response':
+                    usage = event.get('usage')
+                    # Totals are summed after the loop, outside this try, so
+                    # drop usage with non-integer counts here.
+                    if isinstance(usage, dict) and all(
+                        isinstance(usage.get(key, 0), int) for key in USAGE_KEYS.values()
+                    ):
+                        usages.append(usage)
+                
+                if event['type'] == 'tool_use':
+                    tool_usage['edit'] += 1  # Patch application is like an edit
+            except (ValueError, KeyError, TypeError, AttributeError):
+                # orjson.JSONDecodeError is a ValueError; skip malformed lines.
+                continue
+
+    tokens = {
+        name: sum(u.get(key, 0) for u in usages)
+        for name, key in USAGE_KEYS.items()
+    }
 
     duration = 0
-    if start_time and end_time:
-        duration = (end_time - start_time).total_seconds()
+    if min_ts and max_ts:
+        try:
+            duration = (_parse_ts(max_ts) - _parse_ts(min_ts)).total_seconds()
+        except (ValueError, TypeError):
+            pass
 
     # 2. Analyze Pre-Verification
     pre_stats = {"passed": 0, "failed": 0, "error": False}
-    if os.path.exists(LOG_FILES['pre']):
-        with open(LOG_FILES['pre'], 'r') as f:
-            pre_stats = parse_pytest_output(f.read())
+    if LOG_FILES['pre'] in present:
+        pre_stats = parse_pytest_output(read_tail(LOG_FILES['pre']), head=read_head(LOG_FILES['pre']))
         tool_usage['bash'] += 1
 
     # 3. Analyze Post-Verification
     post_stats = {"passed": 0, "failed": 0, "error": False}
-    if os.path.exists(LOG_FILES['post']):
-        with open(LOG_FILES['post'], 'r') as f:
-            post_stats = parse_pytest_output(f.read())
+    if LOG_FILES['post'] in present:
+        post_stats = parse_pytest_output(read_tail(LOG_FILES['post']), head=read_head(LOG_FILES['post']))
         tool_usage['bash'] += 1
 
     # 4. Patch usage
-    if os.path.exists("changes.patch"):
+    if "changes.patch" in present:
         tool_usage['write'] += 1
 
     # Determination
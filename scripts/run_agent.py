@@ -1,11 +1,16 @@
 
 import os
 import sys
-import json
+import atexit
 import time
+import shlex
 import subprocess
-import re
 import yaml
+import orjson
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader
 from datetime import datetime, timezone
 
 # Configuration
@@ -18,28 +23,61 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 TASK_FILE = os.path.join(SCRIPT_DIR, "task.yaml")
 ARTIFACTS_DIR = os.getcwd()
 
+_LOG_FH = None
+
+def _log_fh():
+    """Open agent.log for appending once and reuse the handle."""
+    global _LOG_FH
+    if _LOG_FH is None:
+        _LOG_FH = open(os.path.join(ARTIFACTS_DIR, "agent.log"), "ab")
+        atexit.register(_LOG_FH.close)
+    return _LOG_FH
+
+def _now_iso():
+    """Current UTC time as a fixed-width ISO 8601 string ending in Z."""
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds").replace('+00:00', 'Z')
+
 def log_event(event_type, content, **kwargs):
     """Log event to agent.log in JSONL format."""
-    log_file = os.path.join(ARTIFACTS_DIR, "agent.log")
     entry = {
-        "timestamp": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+        "timestamp": _now_iso(),
         "type": event_type,
-        "content": content
+        "content": content,
+        **kwargs
     }
-    entry.update(kwargs)
-    with open(log_file, "a") as f:
-        f.write(json.dumps(entry) + "\n")
+    fh = _log_fh()
+    fh.write(orjson.dumps(entry) + b"\n")
+    # One write per event; flush so a cancelled job still leaves the log.
+    fh.flush()
 
 def run_command(command, cwd=None, log_file=None):
-    """Execute a bash command and return its output."""
-    print(f"Executing: {command}")
+    """Execute a bash command and return its output.
+
+    A list command is run directly as argv, without a /bin/sh in between.
+    With log_file, the command writes straight into that file and the
+    returned output is None; read the log when the text is needed.
+    """
+    shell = isinstance(command, str)
+    print(f"Executing: {command if shell else shlex.join(command)}")
     try:
         env = os.environ.copy()
         env["PYTHONPATH"] = f"/testbed:/testbed/vendor/infogami:{env.get('PYTHONPATH', '')}"
         
+        if log_file:
+            with open(os.path.join(ARTIFACTS_DIR, log_file), "wb") as f:
+                result = subprocess.run(
+                    command,
+                    shell=shell,
+                    stdout=f,
+                    stderr=subprocess.STDOUT,
+                    cwd=cwd,
+                    env=env
+                )
+            return result.returncode, None
+        
         result = subprocess.run(
             command,
-            shell=True,
+            shell=shell,
             capture_output=True,
             text=True,
             cwd=cwd,
@@ -47,23 +85,27 @@ def run_command(command, cwd=None, log_file=None):
         )
         output = result.stdout + result.stderr
         
-        if log_file:
-            with open(os.path.join(ARTIFACTS_DIR, log_file), "w") as f:
-                f.write(output)
-        
         return result.returncode, output
     except Exception as e:
         return -1, str(e)
 
+_CLIENT = None
+
+def _client():
+    """Create the Anthropic client once so its connection pool is reused."""
+    global _CLIENT
+    if _CLIENT is None:
+        from anthropic import Anthropic
+        _CLIENT = Anthropic(api_key=API_KEY)
+    return _CLIENT
+
 def call_claude(system_prompt, user_message):
     """Call Anthropic API using the official SDK for reliable communication."""
-    from anthropic import Anthropic
-    
     if not API_KEY:
         print("Error: ANTHROPIC_API_KEY or CLAUDE_API_KEY environment variable is missing.")
         return None
 
-    client = Anthropic(api_key=API_KEY)
+    client = _client()
     
     for model in MODELS:
         log_event("request", user_message, model=model)
@@ -91,17 +133,34 @@ def call_claude(system_prompt, user_message):
     
     return None
 
+_DIFF_FENCE = "```diff\n"
+_GIT_FENCE = "```\ndiff --git"
+_CLOSE_FENCE = "\n```"
+
+def _fenced(text, opener, skip):
+    """Return the body of the first `opener` block, starting `skip` chars in."""
+    start = text.find(opener)
+    if start < 0:
+        return None
+    start += skip
+    end = text.find(_CLOSE_FENCE, start)
+    if end < 0:
+        return None
+    return text[start:end]
+
 def extract_patch(text):
     """Extract git patch from markdown blocks."""
-    match = re.search(r"```diff\n(.*?)\n```", text, re.DOTALL)
-    if match:
-        return match.group(1)
-    match = re.search(r"```\n(diff --git.*?)\n```", text, re.DOTALL)
-    if match:
-        return match.group(1)
+    # Plain str.find scans instead of DOTALL .*? regexes, which backtrack
+    # badly on responses with an unclosed fence.
+    patch = _fenced(text, _DIFF_FENCE, len(_DIFF_FENCE))
+    if patch is not None:
+        return patch
+    patch = _fenced(text, _GIT_FENCE, len("```\n"))
+    if patch is not None:
+        return patch
     # If no block, look for diff --git directly
-    if "diff --git" in text:
-        start = text.find("diff --git")
+    start = text.find("diff --git")
+    if start >= 0:
         return text[start:]
     return None
 
@@ -122,7 +181,7 @@ def main():
         sys.exit(1)
         
     with open(TASK_FILE, 'r') as f:
-        task = yaml.safe_load(f)
+        task = yaml.load(f, Loader=SafeLoader)
 
     print(f"=== Task: {task['title']} ===")
     
@@ -130,6 +189,9 @@ def main():
     print("Running pre-verification tests...")
     pre_cmd = task['tests'].get('pre_test_command', task['tests']['test_command'])
     rc, pre_output = run_command(pre_cmd, log_file="pre_verification.log")
+    if pre_output is None:
+        with open(os.path.join(ARTIFACTS_DIR, "pre_verification.log"), errors="replace") as f:
+            pre_output = f.read()
     print(f"Pre-verification exit code: {rc}")
 
     # 3. Use AI Agent to generate fix
@@ -181,11 +243,11 @@ Ensure the patch can be applied with `git apply`.
         f.write(patch)
     
     print("Applying patch...")
-    rc_apply, apply_out = run_command(f"git apply {patch_path}", cwd="/testbed")
+    rc_apply, apply_out = run_command(["git", "apply", patch_path], cwd="/testbed")
     if rc_apply != 0:
         print(f"Git apply failed: {apply_out}")
         print("Trying with -p1...")
-        rc_apply, apply_out = run_command(f"patch -p1 < {patch_path}", cwd="/testbed")
+        rc_apply, apply_out = run_command(["patch", "-p1", "-i", patch_path], cwd="/testbed")
         if rc_apply != 0:
             print(f"Patch apply failed: {apply_out}")
             # We continue anyway to see if post-verification somehow passes or to have logs